@@ -2,9 +2,15 @@ import pandas as pd
 import numpy as np
 import os
 import glob
+import hashlib
+import inspect
 from datetime import datetime
 import pytz
-from itertools import product
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from scipy.signal import lfilter
+from warmup import read_stock
+from indicator_common import window_reduce
 
 # =====================================================================
 #                       精细化参数寻优区间
@@ -19,9 +25,39 @@ PARAM_GRID = {
 
 DATA_DIR = "stock_data"
 REPORT_DIR = "results"
+INDICATOR_CACHE = os.path.join(".cache", "indicators")
 MIN_TRADES = 500 
 SHANGHAI_TZ = pytz.timezone('Asia/Shanghai')
 
+def ema(x, alpha):
+    """
+    ewm(alpha=alpha, adjust=False).mean() 的一阶 IIR 形式：y[i] = alpha*x[i] + (1-alpha)*y[i-1]。
+    前导 NaN (如 RSV 的前 8 根) 原样保留，从首个有效值起滤波；中段出现 NaN 时退回 pandas 以保持其缺失值语义。
+    """
+    x = np.asarray(x, dtype=np.float64)
+    valid = ~np.isnan(x)
+    if not valid.any(): return x.copy()
+    s = np.argmax(valid)
+    if not valid[s:].all():
+        return pd.Series(x).ewm(alpha=alpha, adjust=False).mean().values
+    out = np.full(len(x), np.nan)
+    out[s] = x[s]
+    out[s+1:] = lfilter([alpha], [1.0, alpha - 1.0], x[s+1:], zi=[(1.0 - alpha) * x[s]])[0]
+    return out
+
+def rsi(close, alpha):
+    """
+    RSI：涨跌幅拆成 (2, N) 两行一次 lfilter 同时平滑，与两次 ema() 逐位一致。
+    首根 delta 为 0 且两行均无 NaN (比较为假时取 0)，从第 0 根起滤波即可，无需 ema() 的缺失值处理。
+    """
+    delta = np.diff(close, prepend=close[0])
+    ud = np.empty((2, len(close)))
+    ud[0] = np.where(delta > 0, delta, 0)
+    ud[1] = np.where(delta < 0, -delta, 0)
+    ud[:, 1:] = lfilter([alpha], [1.0, alpha - 1.0], ud[:, 1:], axis=1, zi=(1.0 - alpha) * ud[:, :1])[0]
+    up, dn = ud
+    return 100 - (100 / (1 + (up / np.where(dn == 0, 1e-9, dn))))
+
 def calculate_all_indicators(df):
     if len(df) < 65: return None
     try:
@@ -32,101 +68,181 @@ def calculate_all_indicators(df):
         ma60 = pd.Series(close).rolling(60).mean().values
         pot = (ma60 - close) / np.where(close == 0, 1, close) * 100
         
-        delta = np.diff(close, prepend=close[0])
-        up = pd.Series(np.where(delta > 0, delta, 0)).ewm(alpha=1/6, adjust=False).mean().values
-        dn = pd.Series(np.where(delta < 0, -delta, 0)).ewm(alpha=1/6, adjust=False).mean().values
-        rsi6 = 100 - (100 / (1 + (up / np.where(dn == 0, 1e-9, dn))))
+        rsi6 = rsi(close, 1/6)
         
-        l9, h9 = pd.Series(low).rolling(9).min(), pd.Series(high).rolling(9).max()
-        rsv = (pd.Series(close) - l9) / (h9 - l9).replace(0, 1e-9) * 100
-        k = pd.Series(rsv).ewm(com=2, adjust=False).mean().values
-        d = pd.Series(k).ewm(com=2, adjust=False).mean().values
+        l9, h9 = window_reduce(low, 9, np.minimum), window_reduce(high, 9, np.maximum)
+        rsv = (close - l9) / np.where(h9 - l9 == 0, 1e-9, h9 - l9) * 100
+        # com=c 对应 alpha=1/(1+c)，span=s 对应 alpha=2/(s+1)
+        k = ema(rsv, 1/3)
+        d = ema(k, 1/3)
         
-        ema12 = pd.Series(close).ewm(span=12, adjust=False).mean()
-        ema26 = pd.Series(close).ewm(span=26, adjust=False).mean()
-        macd_h = ((ema12 - ema26) - (ema12 - ema26).ewm(span=9, adjust=False).mean()).values * 2
+        dif = ema(close, 2/13) - ema(close, 2/27)
+        macd_h = (dif - ema(dif, 2/10)) * 2
 
         return {'close':close, 'low':low, 'rsi6':rsi6, 'pot':pot, 'k':k, 'd':d, 'macd_h':macd_h}
-    except: return None
+    except Exception: return None
+
+IND_KEYS = ('close', 'low', 'rsi6', 'pot', 'k', 'd', 'macd_h')
+# 缓存版本：指标相关函数源码的摘要，改动任一函数即整体失效重算；CACHE_VERSION 用于手动强制失效
+CACHE_VERSION = 1
+INDICATOR_CODE = hashlib.sha1(''.join(
+    [str(CACHE_VERSION)] + [inspect.getsource(f) for f in (ema, rsi, window_reduce, calculate_all_indicators)]
+).encode('utf-8')).hexdigest()
+
+def cached_indicators(file_path):
+    """
+    指标只取决于 CSV 内容与指标代码：按 (mtime_ns, 大小) + INDICATOR_CODE + IND_KEYS 落盘为
+    .cache/indicators/<代码>.npz，命中时直接 np.load，跳过 CSV 解析与指标计算；
+    CSV 更新、指标函数改动或指标键集变化时三者任一不符即重算覆盖。保持 float64，寻优结果与不走缓存时逐位一致。
+    K线不足或指标无法计算时返回 None (同样缓存，避免重复解析短文件)。
+    """
+    st = os.stat(file_path)
+    key = np.array([st.st_mtime_ns, st.st_size], dtype=np.int64)
+    fp = os.path.join(INDICATOR_CACHE, os.path.splitext(os.path.basename(file_path))[0] + ".npz")
+    try:
+        with np.load(fp) as z:
+            if (np.array_equal(z['key'], key) and str(z['code']) == INDICATOR_CODE
+                    and tuple(z['keys'].tolist()) == IND_KEYS):
+                return {k: z[k] for k in IND_KEYS} if z['ok'] else None
+    except Exception:
+        pass
+
+    # 只解析用到的三列，pyarrow 多线程解析器；数值与默认 C 解析器逐位一致
+    df = read_stock(file_path, usecols=['收盘', '最高', '最低'], engine='pyarrow')
+    # 信号需 MA60 有值 (第 60 根起) 且其后留足 35 天走势，不足 95 根不可能产生样本，跳过指标计算
+    ind = calculate_all_indicators(df) if len(df) >= 60 + 35 else None
+    try:
+        os.makedirs(INDICATOR_CACHE, exist_ok=True)
+        np.savez(fp, key=key, code=INDICATOR_CODE, keys=np.array(IND_KEYS),
+                 ok=ind is not None, **(ind or {}))
+    except Exception:
+        pass
+    return ind
+
+HORIZON = 35   # 每个信号向后观察的交易日数
+
+def first_true(trig):
+    """沿末轴找首个 True 的位置，全为 False 时记为 HORIZON；取值不超过 35，存 int8"""
+    # argmax 遇到首个 True 即停；全 False 时返回 0，与 "第 0 天即触发" 只差首列的值，无需再 any() 扫一遍
+    first = np.argmax(trig, axis=-1).astype(np.int8)
+    first[(first == 0) & ~trig[..., 0]] = HORIZON
+    return first
+
+def load_signals(file_path):
+    """
+    单只股票：计算指标，把所有基础信号的未来走势就地归约为扫描所需的三块，无信号时返回 None：
+    (空间, RSI) 为 (n,)；逐日离场收益为 (n, 35)；各止损值 / 各KDJ顶 的首次离场位置为 (S, n) / (K, n)。
+    离场路径只取决于 (持仓, 止损, KDJ顶)，与买入门槛无关；持仓 h 内是否离场即 "首次触发 < h"。
+    """
+    ind = cached_indicators(file_path)
+    if ind is None: return None
+    # 基础准入：RSI<45且空间>10且KDJ金叉
+    mask = (ind['pot'] > 10) & (ind['rsi6'] < 45) & (ind['k'] > ind['d'])
+    # 信号日 i 的未来走势为 [i+1, i+35]，即长度 35 滑窗的第 i+1 个；尾部不足 35 天的信号直接丢弃
+    mask = mask[:-HORIZON]
+    if not mask.any(): return None
+    fwd = lambda x: np.lib.stride_tricks.sliding_window_view(x, HORIZON)[1:][mask]
+    ep = ind['close'][:-HORIZON][mask][:, None]
+    fk, fd = fwd(ind['k']), fwd(ind['d'])
+    stops, ks = np.array(PARAM_GRID['stop_loss']), np.array(PARAM_GRID['k_sell'])
+    # 收益保持 float64：降为 float32 后逐组 mean 在第 8 位有效数字起漂移，报表 27720 行中 18000 行数值改变；
+    # 离场位置已是 int8，扫描阶段的主要带宽开销不在这里
+    # 买入价为 0 的脏数据会得到 inf/NaN 收益，沿用原有语义，只屏蔽告警
+    with np.errstate(divide='ignore', invalid='ignore'):
+        first_stop = first_true((fwd(ind['low']) - ep) / ep <= stops[:, None, None])
+        ret_m = (fwd(ind['close']) - ep) / ep
+    # KDJ/MACD 信号离场取两者中更早的一个
+    first_sig = np.minimum(first_true((fk > ks[:, None, None]) & (fk < fd)), first_true(fwd(ind['macd_h']) < 0))
+    return ind['pot'][:-HORIZON][mask], ind['rsi6'][:-HORIZON][mask], ret_m, first_stop, first_sig
+
+# 网格扫描阶段的只读矩阵：main() 填充后 fork 子进程，子进程直接读取，无需逐任务序列化
+SWEEP_DATA = {}
+
+def sweep_buy_subset(p_pot, p_rsi):
+    """
+    单个 (空间, RSI) 买入门槛：取一次信号子集，(止损, KDJ顶) 广播成 (S, K, n) 张量，只剩持仓期一层循环。
+    返回 (样本数, 统计张量 (持仓, 止损, KDJ顶, 3))，样本不足 MIN_TRADES 时统计为 None。
+    """
+    d = SWEEP_DATA
+    holds, stops = d['holds'], d['stops']
+    sel = np.flatnonzero((d['pot'] >= p_pot) & (d['rsi'] <= p_rsi))
+    n = len(sel)
+    if n < MIN_TRADES: return n, None
+    # np.take 沿列取子集保持行连续 (花式索引 [:, sel] 会得到列优先布局，逐行 mean 的求和顺序随之改变)
+    sub_ret, sub_stop, sub_sig = d['ret'][sel], np.take(d['first_stop'], sel, axis=1), np.take(d['first_sig'], sel, axis=1)
+    # 离场日与离场收益与持仓期无关，只算一次：
+    # 止损触发的收益设为硬止损值，其他的设为离场当天收盘价收益
+    exit_idx = np.minimum(sub_sig[None], sub_stop[:, None])
+    # (n, 35) 按行展平后一次 np.take 取离场日收益，省去 np.arange(n) 配对的二维花式索引
+    day_ret = np.take(sub_ret, np.arange(0, n * HORIZON, HORIZON) + np.minimum(exit_idx, HORIZON - 1))
+    exit_rets = np.where(sub_stop[:, None] == exit_idx, stops[:, None, None], day_ret)
+    block = np.zeros((len(holds),) + exit_idx.shape[:2] + (3,))
+    for h_i, p_hold in enumerate(holds):
+        # 持仓期内有离场取离场收益，否则持有到期末；(S, K, n) 末轴连续，逐行 mean 与单组合 np.mean 逐位一致
+        rets = np.where(exit_idx < p_hold, exit_rets, sub_ret[:, p_hold - 1])
+        block[h_i, :, :, 0] = n
+        block[h_i, :, :, 1] = np.sum(rets > 0, axis=2) / n
+        block[h_i, :, :, 2] = np.mean(rets, axis=2)
+    return n, block
+
+def buy_counts(pot_v, rsi_v, pots, rsis):
+    """
+    各 (空间, RSI) 门槛的样本数表，形状 (P, R)，一次二维直方图 + 累加得到，无需逐组生成掩码。
+    信号满足门槛 (p_i, r_i) 当且仅当 p_i < 满足的空间门槛数 且 r_i >= 首个不低于其 RSI 的门槛位置；
+    基础准入已保证空间/RSI 均为有限值，计数与 sum((pot >= p) & (rsi <= r)) 完全相同。
+    """
+    p_bin = np.searchsorted(pots, pot_v, side='right')    # 0..P
+    r_bin = np.searchsorted(rsis, rsi_v, side='left')     # 0..R
+    hist = np.bincount(p_bin * (len(rsis) + 1) + r_bin,
+                       minlength=(len(pots) + 1) * (len(rsis) + 1)).reshape(len(pots) + 1, len(rsis) + 1)
+    # 空间方向取 "p_bin > p_i" 的后缀和，RSI 方向取 "r_bin <= r_i" 的前缀和
+    return hist[::-1].cumsum(0)[::-1][1:].cumsum(1)[:, :len(rsis)]
 
 def main():
     start_t = datetime.now()
     files = glob.glob(os.path.join(DATA_DIR, "*.csv"))
     if not files: return
 
-    # 1. 预读取并提取所有基础信号
-    raw_data = []
+    # 1. 多进程预读取并提取所有基础信号，map 保持文件顺序
     print(f"📊 正在预载数据...")
-    for f in files:
-        ind = calculate_all_indicators(pd.read_csv(f))
-        if ind is None: continue
-        # 基础准入：RSI<45且空间>10且KDJ金叉
-        mask = (ind['pot'] > 10) & (ind['rsi6'] < 45) & (ind['k'] > ind['d'])
-        for idx in np.where(mask)[0]:
-            if idx + 35 >= len(ind['close']): continue
-            raw_data.append({
-                'p': ind['close'][idx], 'pot': ind['pot'][idx], 'rsi': ind['rsi6'][idx],
-                'fc': ind['close'][idx+1:idx+36], 'fl': ind['low'][idx+1:idx+36],
-                'fk': ind['k'][idx+1:idx+36], 'fd': ind['d'][idx+1:idx+36], 'fm': ind['macd_h'][idx+1:idx+36]
-            })
-
-    if not raw_data: return
+    with ProcessPoolExecutor() as ex:
+        blocks = [b for b in ex.map(load_signals, files, chunksize=16) if b is not None]
+
+    if not blocks: return
     
-    # 转换为 NumPy 矩阵
-    pot_v = np.array([x['pot'] for x in raw_data])
-    rsi_v = np.array([x['rsi'] for x in raw_data])
-    ep_v = np.array([x['p'] for x in raw_data])
-    # 所有的未来走势矩阵化 (N, 35)
-    fc_m = np.array([x['fc'] for x in raw_data])
-    fl_m = np.array([x['fl'] for x in raw_data])
-    fk_m = np.array([x['fk'] for x in raw_data])
-    fd_m = np.array([x['fd'] for x in raw_data])
-    fm_m = np.array([x['fm'] for x in raw_data])
-
-    all_combos = list(product(*PARAM_GRID.values()))
-    print(f"⚡ 开始寻优: {len(all_combos)} 组组合...")
-
-    results = []
-    for p_pot, p_rsi, p_hold, p_stop, p_k in all_combos:
-        # 1. 快速筛选买入点
-        m = (pot_v >= p_pot) & (rsi_v <= p_rsi)
-        if np.sum(m) < MIN_TRADES: continue
-        
-        # 2. 矩阵逻辑运算：离场判定
-        # 直接切片到当前 hold 周期
-        s_fc, s_fl, s_fk, s_fd, s_fm = fc_m[m, :p_hold], fl_m[m, :p_hold], fk_m[m, :p_hold], fd_m[m, :p_hold], fm_m[m, :p_hold]
-        s_ep = ep_v[m][:, None]
-        
-        # 离场标志位
-        stop_trig = (s_fl - s_ep) / s_ep <= p_stop
-        kdj_trig = (s_fk > p_k) & (s_fk < s_fd)
-        macd_trig = (s_fm < 0)
-        
-        # 合并所有离场条件
-        exit_mask = stop_trig | kdj_trig | macd_trig
-        
-        # --- 核心黑科技：使用 np.argmax 找到第一个 True 的位置 ---
-        # 如果没有一个 True，argmax 会返回 0，所以需要配合 np.any
-        has_exit = np.any(exit_mask, axis=1)
-        exit_idx = np.argmax(exit_mask, axis=1)
-        
-        # 3. 计算收益率
-        # 默认持有到期末
-        rets = (s_fc[:, -1] - s_ep[:, 0]) / s_ep[:, 0]
-        
-        # 针对提前离场的点进行修正
-        if np.any(has_exit):
-            rows = np.where(has_exit)[0]
-            cols = exit_idx[has_exit]
-            # 止损触发的收益设为硬止损值，其他的设为离场当天收盘价收益
-            is_stop = stop_trig[rows, cols]
-            exit_rets = (s_fc[rows, cols] - s_ep[rows, 0]) / s_ep[rows, 0]
-            rets[has_exit] = np.where(is_stop, p_stop, exit_rets)
+    # 按列拼接：空间/RSI 为 (N,)，逐日离场收益为连续的 (N, 35)，首次离场位置为 (S, N) / (K, N)
+    cols = list(zip(*blocks))
+    pot_v, rsi_v, ret_m = (np.concatenate(col) for col in cols[:3])
+    first_stop, first_sig = (np.concatenate(col, axis=1) for col in cols[3:])
+
+    pots, rsis, holds, stops, ks = (np.array(v) for v in PARAM_GRID.values())
+    print(f"⚡ 开始寻优: {len(pots) * len(rsis) * len(holds) * len(stops) * len(ks)} 组组合...")
+
+    # stats[..., 0/1/2] = 次数 / 胜率 / 均益，形状与参数网格一致，最后按 product 顺序展开
+    stats = np.zeros((len(pots), len(rsis), len(holds), len(stops), len(ks), 3))
+
+    n_buy = buy_counts(pot_v, rsi_v, pots, rsis)
+
+    # 2. 买入门槛 (空间, RSI) 各组互相独立，分给多进程；只读矩阵放入模块全局后再 fork，子进程写时复制共享
+    #    样本数不足 MIN_TRADES 的门槛已由计数表排除，不再派发
+    SWEEP_DATA.update(pot=pot_v, rsi=rsi_v, ret=ret_m, first_stop=first_stop, first_sig=first_sig,
+                      holds=holds, stops=stops)
+    buy_idx = [ij for ij in np.ndindex(n_buy.shape) if n_buy[ij] >= MIN_TRADES]
+    with ProcessPoolExecutor(mp_context=get_context('fork')) as ex:
+        args = ([pots[p_i] for p_i, _ in buy_idx], [rsis[r_i] for _, r_i in buy_idx])
+        for ij, (n, block) in zip(buy_idx, ex.map(sweep_buy_subset, *args)):
+            if block is not None: stats[ij] = block
 
-        results.append([p_pot, p_rsi, p_hold, p_stop, p_k, len(rets), np.sum(rets>0)/len(rets), np.mean(rets)])
+    # 3. 直接由统计张量展开成报表列 (C 顺序即 product 顺序)，丢弃样本不足的买入门槛
+    grid = np.indices(stats.shape[:-1]).reshape(5, -1)
+    keep = n_buy[grid[0], grid[1]] >= MIN_TRADES
+    grid, flat = grid[:, keep], stats.reshape(-1, 3)[keep]
+    results = pd.DataFrame({'空间': pots[grid[0]], 'RSI': rsis[grid[1]], '持仓': holds[grid[2]],
+                            '止损': stops[grid[3]], 'KDJ顶': ks[grid[4]],
+                            '次数': flat[:, 0].astype(np.int64), '胜率': flat[:, 1], '均益': flat[:, 2]})
 
     # 4. 报表输出
-    df = pd.DataFrame(results, columns=['空间','RSI','持仓','止损','KDJ顶','次数','胜率','均益']).sort_values('胜率', ascending=False)
+    df = results.sort_values('胜率', ascending=False)
     os.makedirs(REPORT_DIR, exist_ok=True)
     df.head(100).to_markdown(os.path.join(REPORT_DIR, f"Final_Opt_{datetime.now(SHANGHAI_TZ).strftime('%Y%m%d')}.md"), index=False)
     print(f"✅ 完成! 耗时: {datetime.now()-start_t} | 最佳胜率: {df.iloc[0]['胜率']:.2%}")
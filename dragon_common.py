@@ -0,0 +1,23 @@
+import pandas as pd
+import numpy as np
+
+# 潜龙出海 5日 / 10日 两个回踩脚本共用的指标计算，各脚本只保留自己的门槛与输出
+
+def tail_mean(x, n):
+    """rolling(n).mean() 的最后一个值；整列滚动而非只取末 n 个求均值，后者与 rolling 可差一个 ulp，会翻转 close == MA 这类临界判定"""
+    return pd.Series(x).rolling(n).mean().iat[-1]
+
+def calculate_indicators(df):
+    """
+    只算最新一日的 MA5 / MA10 / MA20 与 RSI6 (6 日简单平均涨跌幅)，以 dict 返回；
+    筛选只读末行，不再整列写回 df。窗口内含 NaN 时结果为 NaN，与 rolling(n).mean() 一致。
+    """
+    close = df['收盘'].to_numpy(dtype=np.float64)
+    ind = {'MA5': tail_mean(close, 5), 'MA10': tail_mean(close, 10), 'MA20': tail_mean(close, 20)}
+    
+    # RSI6 指标计算：末 7 个收盘价得到 6 个涨跌额
+    delta = np.diff(close[-7:])
+    gain = np.where(delta > 0, delta, 0).mean()
+    loss = np.where(delta < 0, -delta, 0).mean()
+    ind['RSI6'] = 100 - (100 / (1 + gain/(loss + 1e-6)))
+    return ind
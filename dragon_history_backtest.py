@@ -4,6 +4,7 @@ import os
 import glob
 from datetime import datetime
 from multiprocessing import Pool, cpu_count
+from warmup import read_stock
 
 # ==========================================
 # 战法名称：龙头蓄势 (Dragon Momentum) - 极强优选版
@@ -22,84 +23,96 @@ from multiprocessing import Pool, cpu_count
 STOCK_DATA_DIR = './stock_data/'
 NAMES_FILE = './stock_names.csv'
 OUTPUT_DIR = datetime.now().strftime('%Y%m')
+# 只读取扫描用到的列 (有 warmup.py 生成的列存缓存时直接按列解码)
+USE_COLS = ['日期', '收盘', '最高', '成交量', '涨跌幅', '换手率']
+# 代码 -> 名称，进程池启动时由 initializer 注入各 worker
+NAME_MAP = {}
 
-def backtest_logic(file_path):
+def init_worker(name_map):
+    global NAME_MAP
+    NAME_MAP = name_map
+
+def backtest_logic(file_code):
+    """file_code 为 (文件路径, 代码)，代码由父进程从文件名解析一次"""
+    file_path, code = file_code
     try:
-        code = os.path.basename(file_path).replace('.csv', '')
-        # 严格过滤板块：00, 60开头，排除ST
-        if not code.startswith(('60', '00')) or 'ST' in code:
-            return None
-        
-        df = pd.read_csv(file_path)
+        df = read_stock(file_path, usecols=USE_COLS, engine='pyarrow')
         if df.empty or len(df) < 30: return None
-        df = df.sort_values('日期')
+        if not df['日期'].is_monotonic_increasing: df = df.sort_values('日期')
+        
+        # 指标计算 (整列一次算完，不再逐行 iloc)
+        close = df['收盘'].to_numpy()
+        ma5 = df['收盘'].rolling(window=5).mean().to_numpy()
+        ma10 = df['收盘'].rolling(window=10).mean().to_numpy()
+        ma20 = df['收盘'].rolling(window=20).mean().to_numpy()
+        vol = df['成交量'].to_numpy()
+        vol_ma20 = df['成交量'].rolling(window=20).mean().to_numpy()
+        change = df['涨跌幅'].to_numpy(dtype=np.float64)
+        high = df['最高'].to_numpy()
+        
+        # 遍历历史：第 20 根起，且其后留足 5 天观察收益
+        n = len(df)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            vol_ratio = vol / vol_ma20
+        prev_ma20 = np.roll(ma20, 1)
+        
+        # --- 原始战法准入条件 ---
+        cond_base = ((close >= 5.0) & (close <= 20.0) &
+                     (ma5 > ma10) & (ma10 > ma20) &
+                     (ma20 > prev_ma20) &
+                     (change >= 3.0) & (change <= 8.5))
+        cond_base[:20] = False
+        cond_base[max(n - 5, 0):] = False
+        
+        # --- 评分逻辑 ---
+        turnover = df['换手率'].to_numpy(dtype=np.float64)
+        # 三个条件直接按布尔值乘权重相加，整列一次算完，无逐项分支
+        score = (vol_ratio > 3) * 40 + (turnover > 5) * 30 + (close >= high * 0.99) * 30
         
-        # 指标计算
-        df['MA5'] = df['收盘'].rolling(window=5).mean()
-        df['MA10'] = df['收盘'].rolling(window=10).mean()
-        df['MA20'] = df['收盘'].rolling(window=20).mean()
-        df['VOL_MA20'] = df['成交量'].rolling(window=20).mean()
+        # --- 极强精简过滤 ---
+        hits = np.flatnonzero(cond_base & (score >= 80) & (vol_ratio >= 2.5) & (vol_ratio <= 4.5))
+        # 后 5 日最高价：5 日滑窗视图第 i+1 行即 [i+1, i+5]，只取命中行；fmax 跳过 NaN，与 Series.max() 一致
+        future_high = np.fmax.reduce(np.lib.stride_tricks.sliding_window_view(high, 5)[hits + 1], axis=1)
+        max_profit = ((future_high - close[hits]) / close[hits]) * 100
         
-        hit_signals = []
-        # 遍历历史
-        for i in range(20, len(df) - 5):
-            curr = df.iloc[i]
-            prev = df.iloc[i-1]
-            
-            price = float(curr['收盘'])
-            change = float(curr['涨跌幅'])
-            vol_ratio = curr['成交量'] / curr['VOL_MA20']
-            
-            # --- 原始战法准入条件 ---
-            cond_base = (5.0 <= price <= 20.0 and 
-                         curr['MA5'] > curr['MA10'] > curr['MA20'] and 
-                         curr['MA20'] > prev['MA20'] and
-                         3.0 <= change <= 8.5)
-            
-            if cond_base:
-                # --- 评分逻辑 ---
-                score = 0
-                turnover = float(curr['换手率'])
-                if vol_ratio > 3: score += 40
-                if turnover > 5: score += 30
-                if curr['收盘'] >= curr['最高'] * 0.99: score += 30 
-                
-                # --- 极强精简过滤 ---
-                if score >= 80 and 2.5 <= vol_ratio <= 4.5:
-                    future_high = df.iloc[i+1 : i+6]['最高'].max()
-                    max_profit = ((future_high - price) / price) * 100
-                    
-                    hit_signals.append({
-                        '日期': curr['日期'],
-                        '代码': code,
-                        '收盘': price,
-                        '涨幅%': change,
-                        '量比': round(vol_ratio, 2),
-                        '换手%': turnover,
-                        '信号强度': "极强 (⭐⭐⭐⭐⭐)",
-                        '5日内最高收益%': round(max_profit, 2),
-                        '操作建议': "极强抢筹；若3日无收益或破触发日最低价则离场"
-                    })
-        return hit_signals
-    except:
+        if len(hits) == 0: return None
+        # 命中行按列返回 (字典值为等长数组)，父进程一次拼成 DataFrame，不再逐行构造字典
+        return {
+            '日期': df['日期'].to_numpy()[hits],
+            '代码': code,
+            'name': NAME_MAP.get(code),
+            '收盘': close[hits].astype(np.float64),
+            '涨幅%': change[hits],
+            '量比': np.round(vol_ratio[hits], 2),
+            '换手%': turnover[hits],
+            '信号强度': "极强 (⭐⭐⭐⭐⭐)",
+            '5日内最高收益%': np.round(max_profit, 2),
+            '操作建议': "极强抢筹；若3日无收益或破触发日最低价则离场"
+        }
+    except Exception:
         return None
 
 def run_main():
     if not os.path.exists(OUTPUT_DIR): os.makedirs(OUTPUT_DIR)
-    files = glob.glob(os.path.join(STOCK_DATA_DIR, "*.csv"))
+    # 严格过滤板块：00, 60开头，排除ST；直接按文件名模式列目录，其他板块不进入任务列表
+    files = glob.glob(os.path.join(STOCK_DATA_DIR, "[06]0*.csv"))
+    tasks = [(f, os.path.basename(f).replace('.csv', '')) for f in files]
+    tasks = [(f, code) for f, code in tasks if 'ST' not in code]
     
-    with Pool(cpu_count()) as p:
-        results = p.map(backtest_logic, files)
+    name_map = {}
+    if os.path.exists(NAMES_FILE):
+        names_df = pd.read_csv(NAMES_FILE, dtype={'code': str})
+        name_map = dict(zip(names_df['code'], names_df['name']))
+    
+    with Pool(cpu_count(), initializer=init_worker, initargs=(name_map,)) as p:
+        results = p.map(backtest_logic, tasks)
     
-    flat_list = [item for sublist in results if sublist for item in sublist]
-    if not flat_list:
+    frames = [pd.DataFrame(hits) for hits in results if hits is not None]
+    if not frames:
         print("未筛选出极强个股。")
         return
 
-    res_df = pd.DataFrame(flat_list)
-    if os.path.exists(NAMES_FILE):
-        names_df = pd.read_csv(NAMES_FILE, dtype={'code': str})
-        res_df = res_df.merge(names_df, left_on='代码', right_on='code', how='left')
+    res_df = pd.concat(frames, ignore_index=True)
     
     # 结果去重：同日期同代码去重，保留最新
     res_df = res_df.sort_values(by=['日期', '量比'], ascending=[False, False])
@@ -4,6 +4,8 @@ import os
 import glob
 from datetime import datetime
 from multiprocessing import Pool
+from dragon_common import calculate_indicators
+from warmup import read_stock
 
 # ==========================================
 # 战法备注：【潜龙出海·10日缩量回踩战法】
@@ -16,31 +18,19 @@ from multiprocessing import Pool
 # ==========================================
 
 DATA_DIR = './stock_data/'
+# 只解析筛选用到的列
+USE_COLS = ['股票代码', '收盘', '成交量', '涨跌幅']
 NAMES_FILE = './stock_names.csv'
 
-def calculate_indicators(df):
-    close = df['收盘']
-    df['MA5'] = close.rolling(5).mean()
-    df['MA10'] = close.rolling(10).mean()
-    df['MA20'] = close.rolling(20).mean()
-    # RSI6 
-    delta = close.diff()
-    gain = (delta.where(delta > 0, 0)).rolling(window=6).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(window=6).mean()
-    df['RSI6'] = 100 - (100 / (1 + gain/(loss + 1e-6)))
-    return df
-
 def screen_logic(file_path):
     try:
-        # 自动识别分隔符
-        with open(file_path, 'r', encoding='utf-8') as f:
-            sep = '\t' if '\t' in f.readline() else ','
-        df = pd.read_csv(file_path, sep=sep)
+        # 优先读列存缓存；回退读 CSV 时只看首行识别分隔符
+        df = read_stock(file_path, usecols=USE_COLS, sniff=True, engine='pyarrow')
         if len(df) < 30: return None
         
-        df = calculate_indicators(df)
+        ind = calculate_indicators(df)
         curr = df.iloc[-1]
-        code = str(curr['股票代码']).zfill(6)
+        code = str(df['股票代码'].iloc[-1]).zfill(6)
 
         # --- 过滤：排除创业板和极端价格 ---
         if code.startswith('30') or curr['收盘'] < 5.0 or curr['收盘'] > 30.0: return None
@@ -50,23 +40,23 @@ def screen_logic(file_path):
 
         # --- 核心逻辑 2：寻找“基因” ---
         # 过去 10 天内必须有大阳线 (主力进场信号)
-        recent_10 = df.iloc[-10:-1]
-        has_big_sun = recent_10['涨跌幅'].max() > 6.0
+        recent_pct = df['涨跌幅'].to_numpy()[-10:-1]
+        has_big_sun = np.nanmax(recent_pct) > 6.0
         if not has_big_sun: return None
         
         # --- 核心逻辑 3：缩量回踩 ---
         # 异动那天的成交量
-        max_vol_day = recent_10.loc[recent_10['涨跌幅'].idxmax(), '成交量']
+        max_vol_day = df['成交量'].to_numpy()[-10:-1][np.nanargmax(recent_pct)]
         if curr['成交量'] > max_vol_day * 0.6: return None # 成交量必须大幅萎缩，代表抛压消失
         
         # --- 核心逻辑 4：趋势支撑 ---
         # 股价正在 MA5 或 MA10 附近，且没有跌破
-        on_support = (curr['收盘'] >= curr['MA10'] * 0.99) and (curr['收盘'] <= curr['MA5'] * 1.02)
+        on_support = (curr['收盘'] >= ind['MA10'] * 0.99) and (curr['收盘'] <= ind['MA5'] * 1.02)
         
         # --- 评分 ---
         score = 70
         if on_support: score += 15
-        if 50 < curr['RSI6'] < 65: score += 15 # RSI 回落到黄金中位区
+        if 50 < ind['RSI6'] < 65: score += 15 # RSI 回落到黄金中位区
         
         if score >= 85:
             return {
@@ -74,10 +64,12 @@ def screen_logic(file_path):
                 '评分': score, '信号': "【潜龙出海·买点】",
                 '操作建议': "该股前期有主力建仓，目前属于缩量回踩。买在阴线或平盘，止损设在MA10，博弈次日反包大阳线。"
             }
-    except: return None
+    except Exception: return None
 
 if __name__ == "__main__":
     files = glob.glob(os.path.join(DATA_DIR, "*.csv"))
+    # 文件名即代码：创业板在分发前就排除，worker 内仍以 CSV 中的股票代码为准
+    files = [f for f in files if not os.path.basename(f).startswith('30')]
     with Pool(os.cpu_count()) as p:
         results = [r for r in p.map(screen_logic, files) if r is not None]
     
@@ -4,6 +4,8 @@ import os
 import glob
 from datetime import datetime
 from multiprocessing import Pool
+from dragon_common import calculate_indicators
+from warmup import read_stock
 
 # ==========================================
 # 战法备注：【潜龙出海·5日缩量回踩战法】
@@ -16,33 +18,20 @@ from multiprocessing import Pool
 # ==========================================
 
 DATA_DIR = './stock_data/'
+# 只解析筛选用到的列
+USE_COLS = ['股票代码', '收盘', '成交量', '涨跌幅']
 NAMES_FILE = './stock_names.csv'
 
-def calculate_indicators(df):
-    close = df['收盘']
-    df['MA5'] = close.rolling(5).mean()
-    df['MA10'] = close.rolling(10).mean()
-    df['MA20'] = close.rolling(20).mean()
-    
-    # RSI6 指标计算
-    delta = close.diff()
-    gain = (delta.where(delta > 0, 0)).rolling(window=6).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(window=6).mean()
-    df['RSI6'] = 100 - (100 / (1 + gain/(loss + 1e-6)))
-    return df
-
 def screen_logic(file_path):
     try:
-        # 自动识别 CSV 分隔符
-        with open(file_path, 'r', encoding='utf-8') as f:
-            sep = '\t' if '\t' in f.readline() else ','
-        df = pd.read_csv(file_path, sep=sep)
+        # 优先读列存缓存；回退读 CSV 时只看首行识别分隔符
+        df = read_stock(file_path, usecols=USE_COLS, sniff=True, engine='pyarrow')
         
         if len(df) < 30: return None
         
-        df = calculate_indicators(df)
+        ind = calculate_indicators(df)
         curr = df.iloc[-1]
-        code = str(curr['股票代码']).zfill(6)
+        code = str(df['股票代码'].iloc[-1]).zfill(6)
 
         # --- 基础过滤 ---
         if code.startswith('30') or 'ST' in file_path: return None
@@ -54,25 +43,24 @@ def screen_logic(file_path):
 
         # --- 核心逻辑 2：5日内寻找异动基因 (你的核心修改点) ---
         # 范围：从前第5天到前第1天
-        recent_5 = df.iloc[-6:-1]
-        big_sun_day = recent_5[recent_5['涨跌幅'] > 6.0]
-        if big_sun_day.empty: return None
+        recent_pct = df['涨跌幅'].to_numpy()[-6:-1]
+        if not (recent_pct > 6.0).any(): return None
         
         # --- 核心逻辑 3：精准缩量回踩 ---
         # 以这 5 天内涨幅最高的那天的成交量为基准
-        max_vol_day = big_sun_day.loc[big_sun_day['涨跌幅'].idxmax(), '成交量']
+        max_vol_day = df['成交量'].to_numpy()[-6:-1][np.nanargmax(recent_pct)]
         if curr['成交量'] > max_vol_day * 0.6: return None 
         
         # --- 核心逻辑 4：趋势与 RSI 共振 ---
         # 股价正在 MA5 或 MA10 附近（上下 2% 范围内）
-        on_support = (curr['收盘'] >= curr['MA10'] * 0.98) and (curr['收盘'] <= curr['MA5'] * 1.02)
+        on_support = (curr['收盘'] >= ind['MA10'] * 0.98) and (curr['收盘'] <= ind['MA5'] * 1.02)
         # 股价必须在 MA20 生命周期之上
-        if curr['收盘'] < curr['MA20']: return None
+        if curr['收盘'] < ind['MA20']: return None
         
         # --- 自动化复盘评分 ---
         score = 70
         if on_support: score += 15
-        if 50 < curr['RSI6'] < 68: score += 15 
+        if 50 < ind['RSI6'] < 68: score += 15 
         
         if score >= 85:
             return {
@@ -83,11 +71,13 @@ def screen_logic(file_path):
                 '信号': "【潜龙出海·5日回踩】",
                 '操作建议': "5日内有强力异动，目前缩量回踩关键支撑位，且RSI未走弱。建议分批建仓，破MA20止损。"
             }
-    except: 
+    except Exception: 
         return None
 
 if __name__ == "__main__":
     files = glob.glob(os.path.join(DATA_DIR, "*.csv"))
+    # 文件名即代码：创业板 / ST 在分发前就排除，worker 内仍以 CSV 中的股票代码为准
+    files = [f for f in files if not os.path.basename(f).startswith('30') and 'ST' not in os.path.basename(f)]
     
     # 并行扫描提升速度
     with Pool(os.cpu_count()) as p:
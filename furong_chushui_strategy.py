@@ -3,7 +3,8 @@ import numpy as np
 import os
 import glob
 from datetime import datetime
-from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures import ProcessPoolExecutor
+from warmup import read_stock
 
 # ==========================================
 # 战法名称：芙蓉出水 (精英过滤版)
@@ -14,6 +15,9 @@ from concurrent.futures import ProcessPoolExecutor, as_completed
 # 4. 空间过滤：过去10个交易日累计涨幅不超过15%，防止追高接盘。
 # ==========================================
 
+# 只解析用到的列，pyarrow 多线程解析器 (有列存缓存时直接按列解码)
+USE_COLS = ['股票代码', '开盘', '收盘', '成交量', '涨跌幅', '换手率']
+
 def check_signal_elite(df, idx):
     """
     精英版战法逻辑判断
@@ -51,9 +55,44 @@ def check_signal_elite(df, idx):
 
     return True
 
-def process_single_file(file_path, name_map):
+def elite_signal_mask(df):
+    """
+    check_signal_elite 的整列版本：一次算出每个交易日是否满足精英版条件 (前 60 日恒为 False)，
+    判定顺序与阈值同上，用于历史回测取代逐日 iloc 循环
+    """
+    close, open_ = df['收盘'].to_numpy(np.float64), df['开盘'].to_numpy(np.float64)
+    ma5, ma10, ma20, ma60 = (df[c].to_numpy() for c in ('ma5', 'ma10', 'ma20', 'ma60'))
+    vol, v_ma5 = df['成交量'].to_numpy(), df['v_ma5'].to_numpy()
+
+    # 1-2. 价格区间 + 收盘站上四线、开盘在三线之下
+    sig = (close >= 5.0) & (close <= 20.0)
+    sig &= (close > np.maximum.reduce([ma5, ma10, ma20, ma60])) & (open_ < np.minimum.reduce([ma5, ma10, ma20]))
+    # 3. 涨幅门槛
+    sig &= ~(df['涨跌幅'].to_numpy() < 5.0)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # 4. 前一日 MA5/10/20 粘合度
+        prev_mas = np.stack([ma5, ma10, ma20])
+        convergence = np.empty_like(close)
+        convergence[0] = np.nan
+        convergence[1:] = (np.std(prev_mas, axis=0) / np.mean(prev_mas, axis=0))[:-1]
+        sig &= ~(convergence > 0.03)
+        # 5. 前 10 日累计涨幅 (前一日收盘相对 10 日前收盘)
+        recent_increase = np.full_like(close, np.nan)
+        recent_increase[10:] = (close[9:-1] - close[:-10]) / close[:-10]
+        sig &= ~(recent_increase > 0.15)
+        # 6. 两倍量以上
+        volume_ratio = np.where(v_ma5 != 0, vol / v_ma5, 0)
+        sig &= ~(volume_ratio < 2.0)
+
+    sig[:60] = False
+    return sig
+
+def process_single_file(task):
+    """task 为 (文件路径, 股票名称)，名称由父进程按文件名中的代码查好"""
+    file_path, stock_name = task
     try:
-        df = pd.read_csv(file_path)
+        df = read_stock(file_path, usecols=USE_COLS, engine='pyarrow')
         if df.empty or len(df) < 70: return None
         
         # 预计算指标
@@ -63,18 +102,15 @@ def process_single_file(file_path, name_map):
         df['ma60'] = df['收盘'].rolling(60).mean()
         df['v_ma5'] = df['成交量'].rolling(5).mean()
 
-        code = str(df.iloc[-1]['股票代码']).zfill(6)
-        stock_name = name_map.get(code, "未知")
-        
+        code = str(df['股票代码'].iloc[-1]).zfill(6)
         if 'ST' in stock_name or code.startswith('30'): return None
 
         # 历史回测采样 (持股3天)
-        backtest_results = []
-        for i in range(60, len(df) - 5):
-            if check_signal_elite(df, i):
-                buy_price = df.iloc[i+1]['开盘']
-                sell_price = df.iloc[i+3]['收盘']
-                backtest_results.append((sell_price - buy_price) / buy_price)
+        # 信号日 i 取 [60, len-5)，次日开盘买入、第 3 日收盘卖出
+        hits = np.flatnonzero(elite_signal_mask(df)[:len(df) - 5])
+        buy_price = df['开盘'].to_numpy()[hits + 1]
+        sell_price = df['收盘'].to_numpy()[hits + 3]
+        backtest_results = ((sell_price - buy_price) / buy_price).tolist()
 
         # 今日筛选
         today_signal = None
@@ -104,10 +140,15 @@ def main():
 
     print(f"--- 正在运行 [精英过滤版] 并行分析 {len(files)} 个标的 ---")
     
+    # 文件名即代码：创业板 / ST 在分发前就排除，worker 只收到该股名称而非整张名称表
+    tasks = []
+    for f in files:
+        code = os.path.basename(f)[:6]
+        stock_name = name_map.get(code, "未知")
+        if not code.startswith('30') and 'ST' not in stock_name: tasks.append((f, stock_name))
+    # 按块分发，一块文件一次往返；结果按文件顺序返回，回测样本与候选顺序不再随完成先后变化
     with ProcessPoolExecutor() as executor:
-        futures = {executor.submit(process_single_file, f, name_map): f for f in files}
-        for future in as_completed(futures):
-            res = future.result()
+        for res in executor.map(process_single_file, tasks, chunksize=64):
             if res:
                 all_profits.extend(res['backtest'])
                 if res['today']: today_candidates.append(res['today'])
@@ -0,0 +1,15 @@
+import numpy as np
+
+# 超跌扫描 (stock_scanner_go) 与参数寻优 (backtest_optimization) 共用的窗口指标工具
+
+def window_reduce(x, n, op):
+    """连续 n 日窗口极值：n 个错位切片逐一做 np.minimum / np.maximum，输入按 float64 处理，
+    不足 n 日的位置为 NaN，窗口内含 NaN 时结果也为 NaN（与 rolling(n).min()/max() 对齐）"""
+    x = np.asarray(x, dtype=np.float64)
+    out = np.full(len(x), np.nan)
+    if len(x) < n: return out
+    acc = x[n-1:].copy()
+    for k in range(1, n):
+        op(acc, x[n-1-k:len(x)-k], out=acc)
+    out[n-1:] = acc
+    return out
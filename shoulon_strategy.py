@@ -4,6 +4,7 @@ import os
 import glob
 from datetime import datetime
 import multiprocessing
+from warmup import read_stock
 
 """
 战法名称：【首板缩量回踩擒龙战法】
@@ -18,53 +19,64 @@ import multiprocessing
 PRICE_MIN = 5.0
 PRICE_MAX = 20.0
 BACKTEST_DAYS = 60  # 回测过去60个交易日的表现
+# 只读取用到的列 (pyarrow 解析器，有列存缓存时直接按列解码)
+USE_COLS = ['收盘', '最高', '成交量', '涨跌幅']
 
-def get_strategy_signal(df, i):
-    """检测第 i 行是否符合战法信号"""
-    if i < 20: return False, 0
-    
-    curr = df.iloc[i]
-    prev = df.iloc[i-1]
+def get_strategy_signals(df):
+    """逐日判定整列战法信号：返回 (是否命中, 评分) 两个数组，前 20 行恒不命中"""
+    close = df['收盘'].to_numpy(np.float64)
+    vol, pct = df['成交量'].to_numpy(np.float64), df['涨跌幅'].to_numpy(np.float64)
+    n = len(close)
     
     # 基础过滤
-    if not (PRICE_MIN <= curr['收盘'] <= PRICE_MAX): return False, 0
+    hit = (close >= PRICE_MIN) & (close <= PRICE_MAX)
     
-    # 1. 寻找最近5日内的首板
-    lookback = df.iloc[max(0, i-5):i]
-    if lookback.empty or not any(lookback['涨跌幅'] >= 9.9): return False, 0
+    # 1. 寻找最近5日内的首板 (第 i-5 到 i-1 日)
+    limit_up = np.zeros(n, dtype=bool)
+    for k in range(1, 6):
+        limit_up[k:] |= pct[:-k] >= 9.9
+    hit &= limit_up
     
     # 2. 均线计算
-    ma5 = df['收盘'].rolling(5).mean().iloc[i]
-    ma10 = df['收盘'].rolling(10).mean().iloc[i]
-    
-    # 3. 缩量逻辑
-    vol_ratio = curr['成交量'] / prev['成交量']
-    if vol_ratio > 0.65: return False, 0 # 必须显著缩量
+    ma5 = df['收盘'].rolling(5).mean().to_numpy()
+    ma10 = df['收盘'].rolling(10).mean().to_numpy()
     
-    # 4. 支撑逻辑
-    dist_ma5 = abs(curr['收盘'] - ma5) / ma5
-    dist_ma10 = abs(curr['收盘'] - ma10) / ma10
-    if dist_ma5 > 0.02 and dist_ma10 > 0.02: return False, 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # 3. 缩量逻辑：必须显著缩量
+        vol_ratio = np.full(n, np.nan)
+        vol_ratio[1:] = vol[1:] / vol[:-1]
+        hit &= ~(vol_ratio > 0.65)
+        
+        # 4. 支撑逻辑
+        dist_ma5 = np.abs(close - ma5) / ma5
+        dist_ma10 = np.abs(close - ma10) / ma10
+        hit &= ~((dist_ma5 > 0.02) & (dist_ma10 > 0.02))
+    hit[:20] = False
     
     # 评分逻辑
-    score = 50
-    if vol_ratio < 0.45: score += 30
-    if dist_ma5 < 0.01 or dist_ma10 < 0.01: score += 20
-    
-    return True, score
+    score = 50 + 30 * (vol_ratio < 0.45) + 20 * ((dist_ma5 < 0.01) | (dist_ma10 < 0.01))
+    return hit, score
+
+# 代码 -> 名称，进程池启动时由 initializer 注入各 worker
+NAME_DICT = {}
+
+def init_worker(name_dict):
+    global NAME_DICT
+    NAME_DICT = name_dict
 
-def analyze_and_backtest(file_path, name_dict):
+def analyze_and_backtest(file_path):
     try:
-        df = pd.read_csv(file_path)
+        df = read_stock(file_path, usecols=USE_COLS, engine='pyarrow')
         if len(df) < 40: return None
         
         code = os.path.basename(file_path).replace('.csv', '')
         if code.startswith(('30', '688')): return None
-        stock_name = name_dict.get(code, "未知")
+        stock_name = NAME_DICT.get(code, "未知")
         if 'ST' in stock_name: return None
 
         # --- 部分 A: 今日实时信号筛选 ---
-        is_hit, score = get_strategy_signal(df, len(df)-1)
+        hits, scores = get_strategy_signals(df)
+        is_hit, score = hits[-1], int(scores[-1])
         current_signal = None
         if is_hit:
             latest = df.iloc[-1]
@@ -76,20 +88,17 @@ def analyze_and_backtest(file_path, name_dict):
             }
 
         # --- 部分 B: 历史回测逻辑 ---
-        backtest_results = []
-        # 在过去 BACKTEST_DAYS 天中寻找信号
-        start_idx = len(df) - BACKTEST_DAYS
-        for j in range(max(20, start_idx), len(df) - 3): # 至少留3天看涨幅
-            hit, s = get_strategy_signal(df, j)
-            if hit:
-                # 计算信号发出后 3 天内的最高涨幅
-                buy_price = df.iloc[j]['收盘']
-                max_price_3d = df.iloc[j+1:j+4]['最高'].max()
-                pnl = (max_price_3d - buy_price) / buy_price * 100
-                backtest_results.append(pnl)
+        # 在过去 BACKTEST_DAYS 天中寻找信号，至少留3天看涨幅
+        start_idx = max(20, len(df) - BACKTEST_DAYS)
+        sig = np.flatnonzero(hits[start_idx:len(df) - 3]) + start_idx
+        # 计算信号发出后 3 天内的最高涨幅 (fmax 跳过 NaN，同 Series.max)
+        high = df['最高'].to_numpy(np.float64)
+        buy_price = df['收盘'].to_numpy(np.float64)[sig]
+        max_price_3d = np.fmax.reduce([high[sig + 1], high[sig + 2], high[sig + 3]])
+        backtest_results = ((max_price_3d - buy_price) / buy_price * 100).tolist()
 
         return {"current": current_signal, "pnl_list": backtest_results}
-    except:
+    except Exception:
         return None
 
 def run_main():
@@ -98,15 +107,18 @@ def run_main():
         names_df = pd.read_csv('stock_names.csv')
         names_df['code'] = names_df['code'].astype(str).str.zfill(6)
         name_dict = dict(zip(names_df['code'], names_df['name']))
-    except:
+    except Exception:
         name_dict = {}
 
     # 2. 并行扫描
     files = glob.glob('stock_data/*.csv')
     print(f"🚀 开始并行分析 {len(files)} 只个股并执行回测...")
     
-    with multiprocessing.Pool(processes=multiprocessing.cpu_count()) as pool:
-        raw_results = pool.starmap(analyze_and_backtest, [(f, name_dict) for f in files])
+    # 文件名即代码：创业板 / 科创板 / ST 在分发前就排除，worker 内的同样判定保留
+    files = [f for f in files if not os.path.basename(f).startswith(('30', '688'))
+             and 'ST' not in name_dict.get(os.path.basename(f).replace('.csv', ''), "未知")]
+    with multiprocessing.Pool(processes=multiprocessing.cpu_count(), initializer=init_worker, initargs=(name_dict,)) as pool:
+        raw_results = pool.map(analyze_and_backtest, files)
     
     # 3. 汇总数据
     current_hits = []
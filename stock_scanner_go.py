@@ -3,7 +3,10 @@ import numpy as np
 import os
 import glob
 import akshare as ak
+from scipy.signal import lfilter
 from multiprocessing import Pool, cpu_count
+from warmup import read_stock
+from indicator_common import window_reduce
 from datetime import datetime
 import pytz
 
@@ -41,6 +44,16 @@ SHANGHAI_TZ = pytz.timezone('Asia/Shanghai')
 #                          指标计算引擎
 # =====================================================================
 
+def sma(x, n):
+    """n 日简单均值，即 rolling(n).mean()：不足 n 日或窗口内含 NaN 时为 NaN"""
+    return pd.Series(x, dtype=np.float64).rolling(n).mean().to_numpy()
+
+def rma(x, n):
+    """Wilder 平滑 (等价 ewm(alpha=1/n, adjust=False))：一阶 IIR 滤波 y[i] = a*x[i] + (1-a)*y[i-1]，初值 y[0] = x[0]"""
+    a = 1.0 / n
+    x = np.asarray(x, dtype=np.float64)
+    return lfilter([a], [1.0, a - 1.0], x, zi=[(1.0 - a) * x[0]])[0]
+
 def calculate_indicators(df):
     """
     指标说明：
@@ -51,9 +64,9 @@ def calculate_indicators(df):
     """
     if df is None or len(df) < 65: return None
     
-    # 统一日期升序排列
+    # 统一日期升序排列 (源数据基本已按日期升序，已有序时跳过排序)
     d_col = next((c for c in ['日期', 'date', '时间'] if c in df.columns), None)
-    if d_col: df = df.sort_values(d_col).reset_index(drop=True)
+    if d_col and not df[d_col].is_monotonic_increasing: df = df.sort_values(d_col).reset_index(drop=True)
     
     try:
         close = df['收盘'].values if '收盘' in df.columns else df['close'].values
@@ -61,39 +74,39 @@ def calculate_indicators(df):
         low = df['最低'].values if '最低' in df.columns else df['low'].values
         vol = df['成交量'].values if '成交量' in df.columns else df['volume'].values
         turnover = df['换手率'].values if '换手率' in df.columns else np.zeros(len(df))
-    except: return None
+    except Exception: return None
     
     # RSI6 矢量化计算
     delta = np.diff(close, prepend=close[0])
     up = np.where(delta > 0, delta, 0)
     dn = np.where(delta < 0, -delta, 0)
-    def rma(x, n): return pd.Series(x).ewm(alpha=1/n, adjust=False).mean().values
-    rsi6 = 100 - (100 / (1 + (rma(up, 6) / np.where(rma(dn, 6) == 0, 1e-9, rma(dn, 6)))))
+    up_6, dn_6 = rma(up, 6), rma(dn, 6)
+    rsi6 = 100 - (100 / (1 + (up_6 / np.where(dn_6 == 0, 1e-9, dn_6))))
     
     # KDJ (9,3,3)
-    low_9 = pd.Series(low).rolling(9).min().values
-    high_9 = pd.Series(high).rolling(9).max().values
+    low_9 = window_reduce(low, 9, np.minimum)
+    high_9 = window_reduce(high, 9, np.maximum)
     rsv = (close - low_9) / np.where(high_9 - low_9 == 0, 1e-9, high_9 - low_9) * 100
     kdj_k = pd.Series(rsv).ewm(com=2, adjust=False).mean().values
     
     # 均线系统与空间计算
-    ma5 = pd.Series(close).rolling(5).mean().values
-    ma60 = pd.Series(close).rolling(60).mean().values
+    ma5 = sma(close, 5)
+    ma60 = sma(close, 60)
     potential = (ma60 - close) / np.where(close == 0, 1, close) * 100
     
     # 筑底识别：5日线变动率 + 近3日平均振幅
     ma5_change = (ma5 - np.roll(ma5, 1)) / np.where(ma5 == 0, 1, ma5)
     amplitude = (high - low) / np.where(close == 0, 1, close)
-    avg_amp_3 = pd.Series(amplitude).rolling(3).mean().values
+    avg_amp_3 = sma(amplitude, 3)
     
     # 量能分析
-    vol_ma5 = pd.Series(vol).shift(1).rolling(5).mean().values
+    vol_ma5 = sma(np.concatenate(([np.nan], vol[:-1])), 5)
     vol_ratio = vol / np.where(vol_ma5 == 0, 1e-9, vol_ma5)
     
     # 辅助过滤
-    min_3d_low = pd.Series(low).shift(1).rolling(3).min().values
+    min_3d_low = np.concatenate(([np.nan], window_reduce(low, 3, np.minimum)[:-1]))
     change = pd.Series(close).pct_change().values * 100
-    avg_turnover_30 = pd.Series(turnover).rolling(30).mean().values
+    avg_turnover_30 = sma(turnover, 30)
 
     return {
         'close': close, 'low': low, 'high': high, 'rsi6': rsi6, 'kdj_k': kdj_k,
@@ -147,26 +160,31 @@ def get_signals_fast(ind):
 # =====================================================================
 
 def backtest_task(file_path):
+    """单票回测 + 最新一根K线选股，一次读取同时返回 (交易收益列表, 今日信号行或 None)"""
     try:
-        df = pd.read_csv(file_path)
+        df = read_stock(file_path, engine='pyarrow')
         ind = calculate_indicators(df)
         if ind is None: return None
         sigs = get_signals_fast(ind)
         indices = np.where(sigs != None)[0]
+
+        pick = None
+        if sigs[-1] is not None:
+            pick = {
+                "信号": sigs[-1], "价格": ind['close'][-1], "量比": round(ind['vol_ratio'][-1], 2),
+                "振幅%": round(ind['avg_amp_3'][-1]*100, 2),
+                "空间%": round(ind['potential'][-1], 1)
+            }
         
-        trades = []
-        for idx in indices:
-            if idx + HOLD_DAYS >= len(ind['close']): continue
-            entry_p = ind['close'][idx]
-            period_low = ind['low'][idx+1 : idx+HOLD_DAYS+1].min()
-            # 止损逻辑：若持仓期最低价触及-10%则止损
-            if (period_low - entry_p) / entry_p <= STOP_LOSS_LIMIT:
-                trades.append(STOP_LOSS_LIMIT)
-            else:
-                # 否则持仓至20天期满卖出
-                trades.append((ind['close'][idx+HOLD_DAYS] - entry_p) / entry_p)
-        return trades
-    except: return None
+        # 只回测后面还有满 HOLD_DAYS 根K线的信号；持仓期最低价由滑动窗口一次取出
+        idx = indices[indices + HOLD_DAYS < len(ind['close'])]
+        entry_p = ind['close'][idx]
+        period_low = np.lib.stride_tricks.sliding_window_view(ind['low'], HOLD_DAYS)[idx + 1].min(axis=1)
+        # 止损逻辑：若持仓期最低价触及-10%则止损，否则持仓至20天期满卖出
+        trades = np.where((period_low - entry_p) / entry_p <= STOP_LOSS_LIMIT, STOP_LOSS_LIMIT,
+                          (ind['close'][idx + HOLD_DAYS] - entry_p) / entry_p)
+        return trades.tolist(), pick
+    except Exception: return None
 
 def main():
     start_t = datetime.now()
@@ -177,36 +195,28 @@ def main():
         try:
             n_df = pd.read_csv(NAME_MAP_FILE, dtype={'code': str})
             name_map = dict(zip(n_df['code'].str.zfill(6), n_df['name']))
-        except: pass
+        except Exception: pass
 
     files = glob.glob(os.path.join(DATA_DIR, "*.csv"))
     print(f"🧬 启动空间约束版回测 | 样本: {len(files)}")
     
     with Pool(processes=cpu_count()) as pool:
-        all_rets = [t for res in pool.map(backtest_task, files) if res for t in res]
+        results = pool.map(backtest_task, files)
+    all_rets = [t for res in results if res for t in res[0]]
     
     stats_msg = "数据不足"
     if all_rets:
         rets = np.array(all_rets)
         stats_msg = f"总交易: {len(rets)} | 胜率: {np.sum(rets>0)/len(rets):.2%} | 平均收益: {np.mean(rets):.2%}"
 
+    # 实战信号已在回测进程中随同算出，这里只做名称过滤，无需再次读盘
     picked = []
     print("🎯 正在扫描实战信号...")
-    for f in files:
+    for f, res in zip(files, results):
+        if not res or res[1] is None: continue
         code = os.path.basename(f)[:6]; name = name_map.get(code, "未知")
         if "ST" in name or "退" in name: continue
-        try:
-            ind = calculate_indicators(pd.read_csv(f))
-            if ind:
-                sigs = get_signals_fast(ind)
-                if sigs[-1] is not None:
-                    picked.append({
-                        "代码": code, "名称": name, "信号": sigs[-1], 
-                        "价格": ind['close'][-1], "量比": round(ind['vol_ratio'][-1], 2),
-                        "振幅%": round(ind['avg_amp_3'][-1]*100, 2),
-                        "空间%": round(ind['potential'][-1], 1)
-                    })
-        except: continue
+        picked.append({"代码": code, "名称": name, **res[1]})
 
     report_path = os.path.join(REPORT_DIR, f"Report_{datetime.now(SHANGHAI_TZ).strftime('%Y%m%d')}.md")
     with open(report_path, 'w', encoding='utf-8') as f:
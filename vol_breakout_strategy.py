@@ -3,6 +3,7 @@ import numpy as np
 import os
 import multiprocessing as mp
 from datetime import datetime
+from warmup import read_stock
 
 """
 战法名称：量价突破回踩战法 (Volume Expansion & Contraction Strategy)
@@ -18,6 +19,8 @@ DATA_DIR = 'stock_data'
 NAMES_FILE = 'stock_names.csv'
 PRICE_MIN = 5.0
 PRICE_MAX = 20.0
+# 只读取用到的列 (pyarrow 解析器，有列存缓存时直接按列解码)，并映射为英文字段名
+COL_MAP = {'日期': 'date', '股票代码': 'code', '开盘': 'open', '收盘': 'close', '最高': 'high', '成交量': 'volume', '涨跌幅': 'pct_chg'}
 
 def run_backtest(df, signal_indices):
     """历史回测模块：评估该股历史上触发该战法后的表现"""
@@ -35,18 +38,25 @@ def run_backtest(df, signal_indices):
     avg_gain = np.mean(profits)
     return win_rate, avg_gain
 
-def analyze_stock(file_path, stock_names):
+# 代码 -> 名称，进程池启动时由 initializer 注入各 worker
+STOCK_NAMES = {}
+
+def init_worker(stock_names):
+    global STOCK_NAMES
+    STOCK_NAMES = stock_names
+
+def analyze_stock(file_path):
     """单只股票深度扫描逻辑"""
     try:
-        df = pd.read_csv(file_path)
+        df = read_stock(file_path, usecols=list(COL_MAP), engine='pyarrow')
         if len(df) < 40: return None
         
         # 字段映射
-        df.columns = ['date', 'code', 'open', 'close', 'high', 'low', 'volume', 'amount', 'amplitude', 'pct_chg', 'pct_val', 'turnover']
+        df = df.rename(columns=COL_MAP)
         
         # 1. 基础筛选 (排除ST、创业板、科创板、北交所及价格区间)
         code = str(df['code'].iloc[-1]).zfill(6)
-        name = stock_names.get(code, "未知")
+        name = STOCK_NAMES.get(code, "未知")
         if code.startswith(('30', '68', '8', '4')) or 'ST' in name: return None
         
         last_close = df['close'].iloc[-1]
@@ -108,7 +118,7 @@ def analyze_stock(file_path, stock_names):
             '操作建议': advice,
             '放量基准日': v_day['date']
         }
-    except:
+    except Exception:
         return None
 
 def main():
@@ -117,15 +127,18 @@ def main():
         n_df = pd.read_csv(NAMES_FILE)
         n_df['code'] = n_df['code'].astype(str).str.zfill(6)
         stock_names = dict(zip(n_df['code'], n_df['name']))
-    except:
+    except Exception:
         stock_names = {}
 
     # 并行扫描数据目录下的所有CSV
     csv_files = [os.path.join(DATA_DIR, f) for f in os.listdir(DATA_DIR) if f.endswith('.csv')]
     
     print(f"开始并行扫描 {len(csv_files)} 个标的...")
-    with mp.Pool(processes=mp.cpu_count()) as pool:
-        results = pool.starmap(analyze_stock, [(f, stock_names) for f in csv_files])
+    # 文件名即代码：创业板 / 科创板 / 北交所 / ST 在分发前就排除，worker 内仍以 CSV 中的股票代码为准
+    csv_files = [f for f in csv_files if not os.path.basename(f).startswith(('30', '68', '8', '4'))
+                 and 'ST' not in stock_names.get(os.path.basename(f)[:6], "未知")]
+    with mp.Pool(processes=mp.cpu_count(), initializer=init_worker, initargs=(stock_names,)) as pool:
+        results = pool.map(analyze_stock, csv_files)
     
     # 筛选有效结果
     valid_list = [r for r in results if r is not None]
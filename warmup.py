@@ -0,0 +1,69 @@
+import os
+import glob
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+# 配置路径
+DATA_DIR = "stock_data"
+CACHE_DIR = "stock_data_cache"
+# 缓存与各脚本回退解析所用的 CSV 引擎；pyarrow 会把日期列推断为 datetime.date，C 引擎则保留字符串，两者须一致
+CACHE_ENGINE = "pyarrow"
+
+def cache_path(csv_path):
+    """stock_data/600000.csv -> stock_data_cache/pyarrow/600000.feather (按解析引擎分目录，换引擎后旧缓存不再命中)"""
+    code = os.path.splitext(os.path.basename(csv_path))[0]
+    return os.path.join(CACHE_DIR, CACHE_ENGINE, f"{code}.feather")
+
+def sniff_sep(csv_path):
+    """只看首行判断分隔符：含制表符按 \t，否则按逗号"""
+    with open(csv_path, 'r', encoding='utf-8') as f:
+        return '\t' if '\t' in f.readline() else ','
+
+def read_stock(csv_path, usecols=None, sniff=False, **csv_kwargs):
+    """
+    读取单只股票日线：缓存存在且不旧于 CSV、且调用方只指定 engine=CACHE_ENGINE 时读 Feather 列存
+    (只解码用到的列)，否则回退到 pd.read_csv；缓存按同一引擎写入，两条路径返回的列类型一致
+    (日期同为 datetime.date)。sniff=True 时回退路径先按首行识别分隔符。
+    """
+    fp = cache_path(csv_path)
+    try:
+        if csv_kwargs == {'engine': CACHE_ENGINE} and os.path.getmtime(fp) >= os.path.getmtime(csv_path):
+            return pd.read_feather(fp, columns=usecols)
+    except Exception:
+        pass
+    if sniff: csv_kwargs['sep'] = sniff_sep(csv_path)
+    return pd.read_csv(csv_path, usecols=usecols, **csv_kwargs)
+
+def convert_one(csv_path):
+    """单文件转换：按 CACHE_ENGINE 解析，原样保留其列类型 (制表符分隔的文件同样识别)，压缩格式为 LZ4"""
+    fp = cache_path(csv_path)
+    try:
+        if os.path.exists(fp) and os.path.getmtime(fp) >= os.path.getmtime(csv_path):
+            return 0
+        pd.read_csv(csv_path, sep=sniff_sep(csv_path), engine=CACHE_ENGINE).to_feather(fp, compression='lz4')
+        return 1
+    except Exception as e:
+        print(f"转换失败 {csv_path}: {e}")
+        return 0
+
+def check_cache(csv_path, usecols=None):
+    """同一文件分别走缓存命中 (read_stock) 与回退解析 (pd.read_csv, engine=CACHE_ENGINE)，两者须逐列类型、逐值一致，不一致直接抛错"""
+    if os.path.getmtime(cache_path(csv_path)) < os.path.getmtime(csv_path):
+        raise RuntimeError(f"缓存未命中，无法核对: {csv_path}")
+    hit = read_stock(csv_path, usecols=usecols, engine=CACHE_ENGINE)
+    miss = pd.read_csv(csv_path, usecols=usecols, sep=sniff_sep(csv_path), engine=CACHE_ENGINE)
+    pd.testing.assert_frame_equal(hit, miss)
+
+def main():
+    os.makedirs(os.path.join(CACHE_DIR, CACHE_ENGINE), exist_ok=True)
+    files = glob.glob(os.path.join(DATA_DIR, "*.csv"))
+    with ProcessPoolExecutor() as ex:
+        done = sum(ex.map(convert_one, files, chunksize=32))
+    # 抽一个文件核对缓存与 CSV 两条路径结果相同：整表一次，按列子集 (如 dragon_history_backtest 的读法) 一次
+    if files:
+        check_cache(files[0])
+        check_cache(files[0], usecols=['日期', '收盘', '最高', '成交量', '涨跌幅', '换手率'])
+    print(f"缓存预热完成：新写入 {done} 个，共 {len(files)} 个文件 -> {os.path.join(CACHE_DIR, CACHE_ENGINE)}/")
+
+if __name__ == "__main__":
+    main()
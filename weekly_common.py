@@ -0,0 +1,56 @@
+import os
+import glob
+import pandas as pd
+from warmup import read_stock
+
+# 周线三件套 (海选 / 精选 / 回测) 共用的数据准备与买点判定，各脚本只保留自己的门槛与输出
+WEEKLY_COLUMNS = ['日期', '开盘', '收盘', '最高', '最低', '成交量']
+
+# 量能倍数下限、5周线偏离上限、是否要求阳线；回测与精选脚本对齐
+CROSSOVER_PARAMS = {'min_vol_ratio': 0.8, 'max_bias': 0.05, 'need_yang': False}
+CONFIRM_PARAMS = {'min_vol_ratio': 1.5, 'max_bias': 0.03, 'need_yang': True}
+
+def is_main_board(code):
+    """仅限深沪主板：排除30创业板、688科创板、北交所"""
+    return code.startswith('60') or code.startswith('00')
+
+def list_candidates(names_dict):
+    """stock_data 下主板且非 ST 的日线文件；代码取自文件名，与各 worker 内的判定一致，分发前排除以免白读文件"""
+    files = glob.glob('stock_data/*.csv')
+    codes = [os.path.basename(f).split('.')[0] for f in files]
+    return [f for f, c in zip(files, codes) if is_main_board(c) and "ST" not in names_dict.get(c, "未知")]
+
+def load_weekly(file_path):
+    """日线 -> 周线 (周日为一周结束)，不足 20 周返回 None"""
+    df = read_stock(file_path, usecols=WEEKLY_COLUMNS, engine='pyarrow')
+    df['日期'] = pd.to_datetime(df['日期'])
+    if not df['日期'].is_monotonic_increasing: df.sort_values('日期', inplace=True)
+    df.set_index('日期', inplace=True)
+
+    w_df = df.resample('W').agg({
+        '收盘': 'last', '成交量': 'sum', '最高': 'max', '最低': 'min', '开盘': 'first'
+    })
+    if len(w_df) < 20: return None
+    return w_df
+
+def add_weekly_ma(w_df):
+    """附加 MA5 / MA10 / V_MA5 三列"""
+    w_df['MA5'] = w_df['收盘'].rolling(5).mean()
+    w_df['MA10'] = w_df['收盘'].rolling(10).mean()
+    w_df['V_MA5'] = w_df['成交量'].rolling(5).mean()
+    return w_df
+
+def check_entry(curr, prev, params):
+    """
+    最新一周买点判定，通过时返回 (量能倍数, 5周线偏离)，否则返回 None：
+    价格 5-20 元、MA10 上升且 MA5 > MA10、量能与偏离门槛、(可选) 阳线实体。
+    """
+    if not (5.0 <= curr['收盘'] <= 20.0): return None
+    if curr['MA10'] <= prev['MA10'] or curr['MA5'] <= curr['MA10']: return None
+
+    vol_ratio = curr['成交量'] / curr['V_MA5'] if curr['V_MA5'] > 0 else 0
+    bias_5 = (curr['收盘'] - curr['MA5']) / curr['MA5'] if curr['MA5'] > 0 else 10
+    if vol_ratio < params['min_vol_ratio'] or bias_5 > params['max_bias']: return None
+
+    if params['need_yang'] and curr['收盘'] <= curr['开盘']: return None
+    return vol_ratio, bias_5
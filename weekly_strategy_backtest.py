@@ -1,110 +1,164 @@
 import pandas as pd
 import numpy as np
-import os, glob, pytz
+import os, pytz
 from datetime import datetime
 from concurrent.futures import ProcessPoolExecutor
+from weekly_common import CONFIRM_PARAMS, is_main_board, load_weekly, list_candidates
+
+try:
+    from numba import njit
+except ImportError:
+    # 未安装 numba 时退化为普通 Python 函数，结果一致，只是速度较慢
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]): return args[0]
+        return lambda f: f
 
 BJ_TZ = pytz.timezone('Asia/Shanghai')
 
-def run_backtest(file_path, names_dict):
+@njit(cache=True, error_model='numpy')
+def _roll_mean(x, w):
+    """滑动均值：进窗加、出窗减的 O(1) 递推，Kahan 补偿与同值/符号修正同 pandas rolling(w).mean()，结果逐位一致"""
+    n = len(x)
+    out = np.empty(n, np.float64)
+    nobs, neg_ct, same_ct = 0, 0, 0
+    sum_x, comp_add, comp_rm, prev = 0.0, 0.0, 0.0, np.nan
+    for i in range(n):
+        if i >= w:
+            v = x[i - w]
+            if v == v:
+                nobs -= 1
+                y = -v - comp_rm
+                t = sum_x + y
+                comp_rm = t - sum_x - y
+                sum_x = t
+                if np.signbit(v): neg_ct -= 1
+        v = x[i]
+        if v == v:
+            nobs += 1
+            y = v - comp_add
+            t = sum_x + y
+            comp_add = t - sum_x - y
+            sum_x = t
+            if np.signbit(v): neg_ct += 1
+            if v == prev: same_ct += 1
+            else: same_ct = 1
+            prev = v
+        if nobs >= w:
+            r = sum_x / nobs
+            if same_ct >= nobs: r = prev
+            elif neg_ct == 0 and r < 0: r = 0.0
+            elif neg_ct == nobs and r > 0: r = 0.0
+            out[i] = r
+        else:
+            out[i] = np.nan
+    return out
+
+@njit(cache=True, error_model='numpy')
+def _weekly_kernel(close, open_, vol, years, min_vol_ratio, max_bias, need_yang):
+    """周线指标 + 买点判定 + 持仓推进合并为一次调用，返回 (买入年份, 盈亏%) 两个数组；门槛同 weekly_common.check_entry"""
+    n = len(close)
+    ma5, ma10, v_ma5 = _roll_mean(close, 5), _roll_mean(close, 10), _roll_mean(vol, 5)
+    out_year = np.empty(n, np.int16)
+    out_pnl = np.empty(n, np.float64)
+    k = 0
+    in_pos = False
+    buy_p, buy_y = 0.0, 0
+    for i in range(15, n - 1):
+        c = close[i]
+        if not in_pos:
+            # --- 筛选条件与选股脚本同一套门槛，NaN 比较为 False，不会触发淘汰 ---
+            # 1. 价格过滤 (5-20元)
+            if not (c >= 5.0 and c <= 20.0): continue
+            # 2. 趋势斜率：MA10 向上且 MA5 > MA10
+            if ma10[i] <= ma10[i-1] or ma5[i] <= ma10[i]: continue
+            # 3. 量能门槛 (零值保护)
+            if (vol[i] / v_ma5[i] if v_ma5[i] > 0 else 0.0) < min_vol_ratio: continue
+            # 4. 偏离门槛
+            if ((c - ma5[i]) / ma5[i] if ma5[i] > 0 else 10.0) > max_bias: continue
+            # 5. 形态确认：阳线实体 (收盘 > 开盘)
+            if need_yang and not c > open_[i]: continue
+            # 触发买入：下周一开盘买入
+            in_pos = True
+            buy_p = open_[i+1]
+            buy_y = years[i+1]
+        else:
+            # 离场逻辑：单笔止损 5% 或 MA5 死叉 MA10
+            if c < buy_p * 0.95 or ma5[i] < ma10[i]:
+                out_year[k] = buy_y
+                out_pnl[k] = ((c - buy_p) / buy_p * 100) - 0.3
+                k += 1
+                in_pos = False
+    return out_year[:k], out_pnl[:k]
+
+# 代码 -> 名称，进程池启动时由 initializer 注入各 worker
+NAMES_DICT = {}
+
+def init_worker(names_dict):
+    global NAMES_DICT
+    NAMES_DICT = names_dict
+
+def run_backtest(file_path):
     try:
         code = os.path.basename(file_path).split('.')[0]
         # 【硬性过滤对齐】仅限深沪A股，排除 30 (创业板) 等
-        if not (code.startswith('60') or code.startswith('00')):
-            return []
+        if not is_main_board(code): return None
         
         # 排除 ST
-        stock_name = names_dict.get(code, "未知")
-        if "ST" in stock_name: return []
+        stock_name = NAMES_DICT.get(code, "未知")
+        if "ST" in stock_name: return None
 
-        df = pd.read_csv(file_path)
-        df['日期'] = pd.to_datetime(df['日期'])
-        df.sort_values('日期', inplace=True)
-        df.set_index('日期', inplace=True)
+        # 转换为周线 (与选股脚本共用读取与重采样)
+        w_df = load_weekly(file_path)
+        if w_df is None: return None
         
-        # 转换为周线
-        w_df = df.resample('W').agg({
-            '收盘': 'last', '成交量': 'sum', '最高': 'max', '最低': 'min', '开盘': 'first'
-        })
-        
-        if len(w_df) < 20: return []
-        
-        w_df['MA5'] = w_df['收盘'].rolling(5).mean()
-        w_df['MA10'] = w_df['收盘'].rolling(10).mean()
-        w_df['V_MA5'] = w_df['成交量'].rolling(5).mean()
-        
-        trades = []
-        in_pos = False
-        buy_p, buy_d = 0, None
-        
-        for i in range(15, len(w_df)-1):
-            curr, prev = w_df.iloc[i], w_df.iloc[i-1]
-            if not in_pos:
-                # --- 筛选条件完全对齐精选脚本 ---
-                # 1. 价格过滤 (5-20元)
-                if not (5.0 <= curr['收盘'] <= 20.0): continue
-                
-                # 2. 趋势斜率：MA10 向上且 MA5 > MA10
-                if curr['MA10'] <= prev['MA10'] or curr['MA5'] <= curr['MA10']: continue
-                
-                # 3. 量能门槛：1.5 倍以上 (零值保护)
-                vol_ratio = curr['成交量'] / curr['V_MA5'] if curr['V_MA5'] > 0 else 0
-                if vol_ratio < 1.5: continue
-                
-                # 4. 偏离门槛：3% 以内
-                bias_5 = (curr['收盘'] - curr['MA5']) / curr['MA5'] if curr['MA5'] > 0 else 10
-                if bias_5 > 0.03: continue
-                
-                # 5. 形态确认：阳线实体 (收盘 > 开盘)
-                if not (curr['收盘'] > curr['开盘']): continue
-                
-                # 触发买入：下周一开盘买入
-                in_pos = True
-                buy_p = w_df.iloc[i+1]['开盘']
-                buy_d = w_df.index[i+1]
-                
-            elif in_pos:
-                # 离场逻辑：单笔止损 5% 或 MA5 死叉 MA10  
-                if curr['收盘'] < buy_p * 0.95 or curr['MA5'] < curr['MA10']:
-                    trades.append({
-                        '年份': buy_d.year, 
-                        '盈亏%': ((curr['收盘'] - buy_p) / buy_p * 100) - 0.3
-                    })
-                    in_pos = False
-        return trades
-    except:
-        return []
+        # 必须保持 float64：降为 float32 会改变 5/20 元价格边界、MA 交叉与 5% 止损等临界判定，年度胜率随之偏移
+        close, open_ = w_df['收盘'].to_numpy(np.float64), w_df['开盘'].to_numpy(np.float64)
+        vol = w_df['成交量'].to_numpy(np.float64)
+        # 筛选门槛完全对齐精选脚本
+        years, pnls = _weekly_kernel(close, open_, vol, w_df.index.year.to_numpy(np.int16), **CONFIRM_PARAMS)
+        # 以 (年份, 盈亏%) 两个数组回传主进程，避免逐笔 dict 的序列化开销
+        return (years, pnls) if len(pnls) else None
+    except Exception:
+        return None
 
 def main():
     names_df = pd.read_csv('stock_names.csv', dtype={'code': str})
     names_dict = dict(zip(names_df['code'], names_df['name']))
     
-    all_t = []
-    with ProcessPoolExecutor() as ex:
-        futures = [ex.submit(run_backtest, f, names_dict) for f in glob.glob('stock_data/*.csv')]
-        for f in futures:
-            all_t.extend(f.result())
+    files = list_candidates(names_dict)
+    with ProcessPoolExecutor(initializer=init_worker, initargs=(names_dict,)) as ex:
+        results = [r for r in ex.map(run_backtest, files, chunksize=8) if r is not None]
     
-    if all_t:
-        df = pd.DataFrame(all_t)
-        # 年度汇总
-        annual = df.groupby('年份')['盈亏%'].agg([
-            ('交易次数', 'count'),
-            ('胜率%', lambda x: (x > 0).sum()/len(x)*100),
-            ('均益%', 'mean'),
-            ('盈亏比', lambda x: abs(x[x>0].mean()/x[x<0].mean()) if (x<0).any() else 0)
-        ]).round(2)
+    if results:
+        years = np.concatenate([r[0] for r in results])
+        pnls = np.concatenate([r[1] for r in results])
+        valid, win, loss = ~np.isnan(pnls), pnls > 0, pnls < 0
+
+        # 年度汇总：年份减去起始年即为桶号，np.bincount 一次累加各年的笔数、盈亏笔数与收益和
+        y0 = int(years.min())
+        idx = years.astype(np.intp) - y0
+        def by_year(w): return np.bincount(idx, weights=w)
+        size, n_valid, n_win, n_loss = np.bincount(idx), by_year(valid), by_year(win), by_year(loss)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio = np.abs((by_year(np.where(win, pnls, 0)) / n_win) / (by_year(np.where(loss, pnls, 0)) / n_loss))
+            annual = pd.DataFrame({
+                '年份': np.arange(y0, y0 + len(size)),
+                '交易次数': n_valid.astype(np.int64),
+                '胜率%': n_win / size * 100,
+                '均益%': by_year(np.where(valid, pnls, 0)) / n_valid,
+                '盈亏比': np.where(n_loss > 0, ratio, 0)
+            })[size > 0].round(2)
         
         # 总体汇总
         summary = pd.DataFrame([{
             '年份': '所有年份总计',
-            '交易次数': len(df),
-            '胜率%': round((df['盈亏%'] > 0).sum()/len(df)*100, 2),
-            '均益%': round(df['盈亏%'].mean(), 2),
-            '盈亏比': round(abs(df[df['盈亏%'] > 0]['盈亏%'].mean()/df[df['盈亏%'] < 0]['盈亏%'].mean()) if (df['盈亏%']<0).any() else 0, 2)
+            '交易次数': len(pnls),
+            '胜率%': round(win.sum()/len(pnls)*100, 2),
+            '均益%': round(np.nanmean(pnls), 2),
+            '盈亏比': round(abs(pnls[win].mean()/pnls[loss].mean()) if loss.any() else 0, 2)
         }])
         
-        final_report = pd.concat([annual.reset_index(), summary], ignore_index=True)
+        final_report = pd.concat([annual, summary], ignore_index=True)
         
         now = datetime.now(BJ_TZ)
         folder = now.strftime('%Y-%m')